@@ -0,0 +1,177 @@
+'''
+Benchmark for memory of idle connections of the server program.
+
+It runs the server program on a subprocess, opens `--connections`
+idle websockets to it, and reports the Resident Set Size (RSS) of
+the server per connection. This only works on Linux as it reads
+the RSS from `/proc`.
+
+Run it as:
+
+    $ python3 benchmarks/idle_connections.py --connections 10000
+'''
+
+
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from terminal_chatapp.security import Security
+
+
+def raise_open_files_limit(count):
+    '''
+    Raises the soft limit of open files to `count`, or up
+    to the hard limit. The server subprocess inherits it.
+    '''
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY:
+        count = min(count, hard)
+    if count > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (count, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def get_rss(pid):
+    '''
+    Returns the RSS of process `pid` in bytes.
+    '''
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError(f'Can\'t read the RSS of process {pid}.')
+
+
+def start_server(port, password, digest_count, output):
+    '''
+    Starts the server program on a subprocess and returns
+    it with the cryptography key that it prints out.
+    '''
+    server = subprocess.Popen(
+        [
+            sys.executable, '-u', '-m', 'terminal_chatapp', 'server',
+            '-p', str(port),
+            '--password', password,
+            '-cdc', str(digest_count),
+            '--idle-timeout', '0'
+        ],
+        stdout=output,
+        stderr=subprocess.STDOUT,
+        cwd=ROOT
+    )
+
+    # Wait for the server to print out its cryptography key.
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        output.seek(0)
+        for line in output.read().decode().splitlines():
+            if line.startswith('Key: '):
+                return server, line[len('Key: '):].strip()
+        if server.poll() is not None:
+            break
+        time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('Server program did not start.')
+
+
+async def open_connections(url, security, password, count, concurrency):
+    '''
+    Opens `count` idle websockets to `url`, `concurrency`
+    at a time, and returns them.
+    '''
+    semaphore = asyncio.Semaphore(concurrency)
+    authorization = security.encrypt(password).decode()
+
+    async def connect(index):
+        async with semaphore:
+            return await websockets.connect(
+                url,
+                extra_headers={
+                    'authorization': authorization,
+                    'username': security.encrypt(f'bench_{index}').decode()
+                },
+                max_queue=1
+            )
+
+    return await asyncio.gather(*[connect(index) for index in range(count)])
+
+
+async def benchmark(args):
+    '''
+    Runs the benchmark and prints out the RSS of the
+    server per idle connection.
+    '''
+    with tempfile.TemporaryFile() as output:
+        server, key = start_server(
+            args.port,
+            args.password,
+            args.digest_count,
+            output
+        )
+        try:
+            security = Security(key, args.digest_count)
+            await asyncio.sleep(args.settle)
+            baseline = get_rss(server.pid)
+
+            started = time.monotonic()
+            connections = await open_connections(
+                f'ws://localhost:{args.port}/',
+                security,
+                args.password,
+                args.connections,
+                args.concurrency
+            )
+            elapsed = time.monotonic() - started
+
+            # Let the server finish registering and
+            # notifying the users before measuring.
+            await asyncio.sleep(args.settle)
+            loaded = get_rss(server.pid)
+
+            print('Connections:', len(connections))
+            print(f'Connect time: {elapsed:.2f}s')
+            print(f'Server RSS before: {baseline / 2 ** 20:.1f} MiB')
+            print(f'Server RSS after: {loaded / 2 ** 20:.1f} MiB')
+            print(f'RSS per connection: {(loaded - baseline) / len(connections) / 1024:.2f} KiB')
+
+            await asyncio.gather(
+                *[websocket.close() for websocket in connections],
+                return_exceptions=True
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-n', '--connections', default=10000, type=int)
+    parser.add_argument('-p', '--port', default=1719, type=int)
+    parser.add_argument('--password', default='top_secret')
+    parser.add_argument('-cdc', '--cryptography-digest-count', default=3, type=int, dest='digest_count')
+    parser.add_argument('--concurrency', default=200, type=int)
+    parser.add_argument('--settle', default=2.0, type=float)
+    args = parser.parse_args()
+
+    # The benchmark and the server subprocess each needs a
+    # file descriptor per connection.
+    limit = raise_open_files_limit(args.connections + 1024)
+    if limit < args.connections + 64:
+        parser.error(f'Open files limit is {limit}, raise it with `ulimit -n`.')
+
+    asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -56,6 +56,73 @@ class CommandLineInterface:
             ''',
             dest='digest_count'
         )
+        server_parser.add_argument(
+            '--history-size',
+            default=100,
+            type=int,
+            help='''
+            How many of the last events the server keeps for 
+            sending them again to clients that missed them. 
+            Default is 100.
+            '''
+        )
+        server_parser.add_argument(
+            '--idle-timeout',
+            default=60.0,
+            type=float,
+            help='''
+            Seconds without any message, including heartbeats, 
+            before the server reaps a client. Use 0 to disable. 
+            Default is 60.0.
+            '''
+        )
+        server_parser.add_argument(
+            '--reap-interval',
+            default=5.0,
+            type=float,
+            help='''
+            Seconds between checks for clients to reap. 
+            Default is 5.0.
+            '''
+        )
+        server_parser.add_argument(
+            '--send-timeout',
+            default=5.0,
+            type=float,
+            help='''
+            Seconds the server waits for a client to receive 
+            a message before it stops waiting for it, so a dead 
+            client does not hold up the others. Default is 5.0.
+            '''
+        )
+        server_parser.add_argument(
+            '--profile-dir',
+            default=None,
+            help='''
+            Directory where the server writes a profile and 
+            allocations snapshot diff on SIGUSR1 or `/profile` 
+            command of admin clients. Profiling is disabled 
+            if not given.
+            '''
+        )
+        server_parser.add_argument(
+            '--profile-duration',
+            default=10.0,
+            type=float,
+            help='''
+            How many seconds a profile is captured. 
+            Default is 10.0.
+            '''
+        )
+        server_parser.add_argument(
+            '--admin-password',
+            default=None,
+            help='''
+            Password of admin clients for the `/profile` and 
+            `/stats` commands. Admin commands are disabled if 
+            not given.
+            '''
+        )
 
         # Client program parser.
         client_parser = subparser.add_parser(
@@ -109,6 +176,45 @@ class CommandLineInterface:
             ''',
             dest='digest_count'
         )
+        client_parser.add_argument(
+            '--reorder-window',
+            default=8,
+            type=int,
+            help='''
+            How many events the client keeps while waiting 
+            for a missing event before asking the server to 
+            send it again. Default is 8.
+            '''
+        )
+        client_parser.add_argument(
+            '--gap-timeout',
+            default=1.0,
+            type=float,
+            help='''
+            How many seconds the client waits for a missing 
+            event before asking the server to send it again. 
+            Default is 1.0.
+            '''
+        )
+        client_parser.add_argument(
+            '--heartbeat-interval',
+            default=15.0,
+            type=float,
+            help='''
+            Seconds between heartbeats sent to the server. 
+            It should be lower than the idle timeout of the 
+            server. Default is 15.0.
+            '''
+        )
+        client_parser.add_argument(
+            '--admin-password',
+            default=None,
+            help='''
+            Admin password of the server. If given, typing 
+            `/profile` requests the server to capture a profile 
+            and `/stats` shows the statistics of the server.
+            '''
+        )
         
         self.args = parser.parse_args()
         
@@ -122,6 +228,41 @@ class CommandLineInterface:
             if self.args.program == 'server':
                 raise server_parser.error(error_info)
             raise client_parser.error(error_info)
+
+        # Validates the intervals, timeouts, and window. A 
+        # negative idle timeout would reap every client, a zero 
+        # interval would never pause, and a zero gap timeout 
+        # would treat every slow event as lost.
+        if self.args.program == 'server':
+            if self.args.idle_timeout < 0:
+                raise server_parser.error(
+                    f'Invalid idle timeout. It should be 0 or more but got "{self.args.idle_timeout}".'
+                )
+            if self.args.reap_interval <= 0:
+                raise server_parser.error(
+                    f'Invalid reap interval. It should be more than 0 but got "{self.args.reap_interval}".'
+                )
+            if self.args.send_timeout <= 0:
+                raise server_parser.error(
+                    f'Invalid send timeout. It should be more than 0 but got "{self.args.send_timeout}".'
+                )
+            if self.args.profile_duration <= 0:
+                raise server_parser.error(
+                    f'Invalid profile duration. It should be more than 0 but got "{self.args.profile_duration}".'
+                )
+        elif self.args.program == 'client':
+            if self.args.heartbeat_interval <= 0:
+                raise client_parser.error(
+                    f'Invalid heartbeat interval. It should be more than 0 but got "{self.args.heartbeat_interval}".'
+                )
+            if self.args.gap_timeout <= 0:
+                raise client_parser.error(
+                    f'Invalid gap timeout. It should be more than 0 but got "{self.args.gap_timeout}".'
+                )
+            if self.args.reorder_window < 0:
+                raise client_parser.error(
+                    f'Invalid reorder window. It should be 0 or more but got "{self.args.reorder_window}".'
+                )
     
     
     def run(self):
@@ -134,7 +275,14 @@ class CommandLineInterface:
                 server = Server(
                     port=self.args.port, 
                     password=self.args.password,
-                    cryptography_digest_count=self.args.digest_count
+                    cryptography_digest_count=self.args.digest_count,
+                    history_size=self.args.history_size,
+                    profile_dir=self.args.profile_dir,
+                    profile_duration=self.args.profile_duration,
+                    admin_password=self.args.admin_password,
+                    idle_timeout=self.args.idle_timeout,
+                    reap_interval=self.args.reap_interval,
+                    send_timeout=self.args.send_timeout
                 )
                 server.run()
 
@@ -145,7 +293,11 @@ class CommandLineInterface:
                     cryptography_digest_count=self.args.digest_count,
                     url=self.args.websocket_url,
                     username=self.args.username,
-                    password=self.args.password
+                    password=self.args.password,
+                    reorder_window=self.args.reorder_window,
+                    gap_timeout=self.args.gap_timeout,
+                    admin_password=self.args.admin_password,
+                    heartbeat_interval=self.args.heartbeat_interval
                 )
                 
                 client.run()
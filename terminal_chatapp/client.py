@@ -7,7 +7,13 @@ from string import digits
 import websockets
 
 from .input import NonBlockingInput
-from .event import create_message_event
+from .event import (
+    create_heartbeat_event,
+    create_message_event, 
+    create_profile_event,
+    create_stats_event,
+    create_resend_event
+)
 from .security import Security
 
 
@@ -22,7 +28,11 @@ class Client:
         cryptography_digest_count=3, 
         url='ws://localhost:1719/', 
         username='', 
-        password='top_secret'
+        password='top_secret',
+        reorder_window=8,
+        gap_timeout=1.0,
+        admin_password=None,
+        heartbeat_interval=15.0
         ):
 
         self.url = url
@@ -47,6 +57,31 @@ class Client:
             'username': self.security.encrypt(self.username).decode()
         }
 
+        # For ordered delivery of events from the server.
+        # Events that arrive ahead of a missing sequence number 
+        # are kept on `self.pending` until the missing one arrives.
+        # If the gap is still there after `reorder_window` events 
+        # or `gap_timeout` seconds, the gap is not just slow, so 
+        # ask the server to send it again. If it is still there 
+        # `gap_timeout` seconds after asking, or the server says 
+        # it is missing, the events are lost.
+        self.reorder_window = reorder_window
+        self.gap_timeout = gap_timeout
+        self.next_sequence = None
+        self.pending = {}
+        self._resend_end = None
+        self._resend_deadline = None
+
+        # Send a heartbeat to the server every 
+        # `heartbeat_interval` seconds so that the server 
+        # knows this client is still connected.
+        self.heartbeat_interval = heartbeat_interval
+
+        # For requesting the server to capture a profile 
+        # by typing `/profile`, or its statistics by 
+        # typing `/stats`.
+        self.admin_password = admin_password
+
         # Have an access to this Client API if connecting to the
         # server is successful. This should not be change by other
         # API.
@@ -67,7 +102,8 @@ class Client:
         it will create a task for `self.chat_forever()` and 
         `self.receive_forever()` method and run them 
         concurrently. This is to allow the client to send 
-        and receive a message at the same time.
+        and receive a message at the same time. A task for 
+        `self.heartbeat_forever()` also runs with them.
         '''
         async with websockets.connect(
             self.url,
@@ -92,8 +128,10 @@ class Client:
             # concurrently.
             chat_task = asyncio.create_task(self.chat_forever(websocket))
             receive_task = asyncio.create_task(self.receive_forever(websocket))
+            heartbeat_task = asyncio.create_task(self.heartbeat_forever(websocket))
             await chat_task
             await receive_task
+            await heartbeat_task
         
 
     async def chat_forever(self, websocket):
@@ -103,46 +141,168 @@ class Client:
         to the websocket server. The message 
         is encrypted using the `self.security`
         before it sends to the websocket server.
+
+        If the client has `self.admin_password`, typing 
+        `/profile` requests the server to capture a profile 
+        and typing `/stats` requests the server statistics
+        instead of sending them as a message.
         '''
         self.keyboard_thread = NonBlockingInput(self._set_message, '')
         while True:
             if not self.message == '':
+                if self.admin_password is not None and self.message == '/profile':
+                    event = create_profile_event(self.admin_password)
+                elif self.admin_password is not None and self.message == '/stats':
+                    event = create_stats_event(self.admin_password)
+                else:
+                    event = create_message_event(self.username, self.message)
+
                 # Send the message as encrypted 
                 # with `self.security`.
-                self.message = self.security.encrypt(
-                    create_message_event(self.username, self.message)
-                ).decode()
+                self.message = self.security.encrypt(event).decode()
                 await websocket.send(self.message)
                 self.message = ''
             await self.sleepy_head()
     
 
+    async def heartbeat_forever(self, websocket):
+        '''
+        Sends an encrypted `heartbeat` event to the websocket 
+        server every `self.heartbeat_interval` seconds.
+        '''
+        heartbeat = self.security.encrypt(create_heartbeat_event()).decode()
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await websocket.send(heartbeat)
+    
+
     async def receive_forever(self, websocket):
         '''
         Gets a message from the `websocket` server 
         every `self.sleepy_head()` and decrypts it
         using `self.security`.
 
+        Events with sequence number are shown in order 
+        using `self.receive_in_order()`. If there is a 
+        gap on the sequence numbers, it only waits for 
+        `self.gap_timeout` seconds for the next message 
+        before handling the gap with `self.handle_gap()`.
+        '''
+        while True:
+            try:
+                rcv = await asyncio.wait_for(
+                    websocket.recv(),
+                    self.gap_timeout if self.pending else None
+                )
+            except asyncio.TimeoutError:
+                await self.handle_gap(websocket)
+                continue
+            rcv = json.loads(self.security.decrypt(rcv))
+            if rcv['type'] == 'missing':
+                self.skip_missing(rcv['start'], rcv['end'])
+            elif 'seq' in rcv:
+                await self.receive_in_order(websocket, rcv)
+            else:
+                self.show_event(rcv)
+            await self.sleepy_head()
+    
+
+    async def receive_in_order(self, websocket, rcv):
+        '''
+        Keeps the `rcv` event on `self.pending` and shows 
+        every pending event that is next on the sequence. 
+        Duplicate events, like the one that is sent again 
+        by the server, are ignored.
+
+        If more than `self.reorder_window` events are 
+        waiting for a missing one, it handles the gap 
+        with `self.handle_gap()`.
+        '''
+        seq = rcv['seq']
+
+        # The first event received is where the sequence starts 
+        # for this client.
+        if self.next_sequence is None:
+            self.next_sequence = seq
+        if seq < self.next_sequence:
+            return
+
+        self.pending[seq] = rcv
+        self._flush_pending()
+        if len(self.pending) > self.reorder_window:
+            await self.handle_gap(websocket)
+    
+
+    async def handle_gap(self, websocket):
+        '''
+        Asks the server to send again the events that are 
+        missing before the pending events. If the server 
+        was already asked and they are still missing 
+        `self.gap_timeout` seconds after asking, the 
+        missing events are lost, so it stops waiting 
+        for them.
+        '''
+        if not self.pending:
+            return
+        end = min(self.pending) - 1
+        now = asyncio.get_event_loop().time()
+        if self._resend_deadline is None:
+            self._resend_end = end
+            self._resend_deadline = now + self.gap_timeout
+            await websocket.send(
+                self.security.encrypt(
+                    create_resend_event(self.next_sequence, end)
+                ).decode()
+            )
+        elif now >= self._resend_deadline:
+            self.skip_missing(self.next_sequence, end)
+    
+
+    def skip_missing(self, start, end):
+        '''
+        Stops waiting for the events from sequence number 
+        `start` to `end` and shows how many of them are lost.
+        '''
+        if self.next_sequence is None or end < self.next_sequence:
+            return
+        print('[Lost]', end - max(start, self.next_sequence) + 1, 'event(s)')
+        self.next_sequence = end + 1
+        self._flush_pending()
+    
+
+    def show_event(self, rcv):
+        '''
         If event type is `users`, it shows how many 
         user is connected to the server. If event 
         type is `message`, it shows the message sender 
         username and its message content, but if the
         message sender is this client, it does not
-        show the message.
+        show the message. If event type is `profiling`, 
+        it shows if the server started capturing a profile. 
+        If event type is `statistics`, it shows the 
+        statistics of the server.
         '''
-        while True:
-            rcv = await websocket.recv()
-            rcv = json.loads(self.security.decrypt(rcv))
-            if rcv['type'] == 'users':
-                print('Users Connected:', rcv['users'])
-            elif rcv['type'] == 'message':
-                # Only show the message if it comes
-                # from other websocket.
-                if not self.username == rcv['from']:
-                    print('[Receive]')
-                    print('From:', rcv['from'])
-                    print('Message:', rcv['message'])
-            await self.sleepy_head()
+        if rcv['type'] == 'users':
+            print('Users Connected:', rcv['users'])
+        elif rcv['type'] == 'message':
+            # Only show the message if it comes
+            # from other websocket.
+            if not self.username == rcv['from']:
+                print('[Receive]')
+                print('From:', rcv['from'])
+                print('Message:', rcv['message'])
+        elif rcv['type'] == 'profiling':
+            if not rcv['authorized']:
+                print('[Profile]', 'Not authorized')
+            else:
+                print('[Profile]', 'Started' if rcv['started'] else 'Not started')
+        elif rcv['type'] == 'statistics':
+            if not rcv['authorized']:
+                print('[Stats]', 'Not authorized')
+                return
+            print('[Stats]')
+            print('Users Connected:', rcv['users'])
+            print('Users Reaped:', rcv['reaped'])
     
 
     async def sleepy_head(self):
@@ -160,6 +320,28 @@ class Client:
         return 'user_' + ''.join(choice(digits) for _ in range(4))
     
 
+    def _flush_pending(self):
+        '''
+        Shows every event on `self.pending` that is next 
+        on the sequence and drops the pending events that 
+        are older than `self.next_sequence`.
+
+        This method is used by `self.receive_in_order()` and 
+        `self.skip_missing()` and should not be use by other API.
+        '''
+        for seq in [seq for seq in self.pending if seq < self.next_sequence]:
+            del self.pending[seq]
+        while self.next_sequence in self.pending:
+            self.show_event(self.pending.pop(self.next_sequence))
+            self.next_sequence += 1
+
+        # The events asked to be sent again are all received
+        # or skipped, so the next gap can be asked again.
+        if self._resend_end is not None and self.next_sequence > self._resend_end:
+            self._resend_end = None
+            self._resend_deadline = None
+    
+
     def _set_message(self, message):
         '''
         It set the `self.message` to `message` parameter.
@@ -0,0 +1,16 @@
+class Connection:
+    '''
+    Server state of a websocket that is connected to the server.
+
+    The websocket itself is the key of the record on 
+    `Server.users`, so it is not kept here.
+    '''
+
+    __slots__ = ('username', 'last_seen')
+
+    def __init__(self, username, last_seen):
+        self.username = username
+
+        # Event loop time when the server last received 
+        # a message from the websocket.
+        self.last_seen = last_seen
@@ -9,16 +9,80 @@ def create_event(type, **kwargs):
     return json.dumps({'type': type, **kwargs})
 
 
-def create_message_event(_from, message):
+def create_message_event(_from, message, **kwargs):
     '''
-    Event for message of websocket clients.
+    Event for message of websocket clients. Extra `kwargs`, 
+    like the sequence number `seq`, are added to the event.
     '''
     event = {'from': _from, 'message': message}
-    return create_event('message', **event)
+    return create_event('message', **event, **kwargs)
 
 
-def create_users_event(users):
+def create_users_event(users, **kwargs):
     '''
-    Event for clients that is connected to the server.
+    Event for clients that is connected to the server. Extra 
+    `kwargs`, like the sequence number `seq`, are added to 
+    the event.
     '''
-    return create_event('users', users=users)
\ No newline at end of file
+    return create_event('users', users=users, **kwargs)
+
+
+def create_heartbeat_event():
+    '''
+    Event for clients telling the server that they are 
+    still connected.
+    '''
+    return create_event('heartbeat')
+
+
+def create_resend_event(start, end):
+    '''
+    Event for clients requesting the server to send again
+    the events from sequence number `start` to `end`.
+    '''
+    return create_event('resend', start=start, end=end)
+
+
+def create_missing_event(start, end):
+    '''
+    Event for the server telling the client that the events 
+    from sequence number `start` to `end` are no longer in 
+    the history and can't be sent again.
+    '''
+    return create_event('missing', start=start, end=end)
+
+
+def create_profile_event(password):
+    '''
+    Event for admin clients requesting the server to 
+    capture a profile. `password` is the admin password 
+    of the server.
+    '''
+    return create_event('profile', password=password)
+
+
+def create_stats_event(password):
+    '''
+    Event for admin clients requesting the statistics of 
+    the server. `password` is the admin password of the 
+    server.
+    '''
+    return create_event('stats', password=password)
+
+
+def create_statistics_event(authorized, **stats):
+    '''
+    Event for the server telling the admin client its 
+    statistics, like how many users are reaped. If not 
+    `authorized`, it has no statistics.
+    '''
+    return create_event('statistics', authorized=authorized, **stats)
+
+
+def create_profiling_event(started, authorized):
+    '''
+    Event for the server telling the admin client if 
+    capturing a profile is started. If not `authorized`, 
+    it is never started.
+    '''
+    return create_event('profiling', started=started, authorized=authorized)
@@ -0,0 +1,224 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from fnmatch import fnmatch
+
+
+class Profiler:
+    '''
+    On-demand sampling profiler and allocation snapshots
+    for Terminal Chat Application.
+    '''
+
+    # Parts of the server that the summary focus on. Each is
+    # a label, filename patterns, and function name. If function
+    # name is None, any function from the files is counted.
+    # Allocations can only be grouped by file, so the
+    # function name is not used for them.
+    focus = (
+        ('Security', ('*/terminal_chatapp/security.py',), None),
+        ('notify_all_user', ('*/terminal_chatapp/server.py',), 'notify_all_user'),
+        ('JSON/event', ('*/terminal_chatapp/event.py', '*/json/*'), None),
+    )
+
+    def __init__(
+        self,
+        directory,
+        duration=10.0,
+        interval=0.005,
+        traceback_limit=10
+        ):
+
+        self.directory = directory
+        self.duration = duration
+        self.interval = interval
+        self.traceback_limit = traceback_limit
+
+        # Only one capture can run at a time.
+        self._thread = None
+
+
+    def capture(self, thread_id):
+        '''
+        Starts capturing a sampling profile of the thread
+        with `thread_id` and a `tracemalloc` snapshot diff
+        for `self.duration` seconds on a background thread,
+        so the server keeps running. The results are written
+        to `self.directory`.
+
+        It returns True if capturing is started, otherwise
+        False if a capture is already running.
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._thread = threading.Thread(
+            target=self._capture,
+            args=(thread_id,),
+            name='profiler-thread',
+            daemon=True
+        )
+        self._thread.start()
+        return True
+
+
+    def _capture(self, thread_id):
+        '''
+        Real function that do the work for `self.capture()`.
+
+        This method should not be use by other API.
+        '''
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.traceback_limit)
+        before = tracemalloc.take_snapshot()
+
+        # Sample the stack of the thread every `self.interval`
+        # seconds until `self.duration` is over.
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + self.duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            del frame, stack
+            time.sleep(self.interval)
+
+        after = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(
+            self.directory,
+            time.strftime('%Y%m%d-%H%M%S')
+        )
+        self.write_profile(prefix, stacks, samples)
+        self.write_allocations(prefix, before, after)
+        print('[Profile]', f'Written to `{prefix}-*`.')
+
+
+    def write_profile(self, prefix, stacks, samples):
+        '''
+        Writes the sampled `stacks` as collapsed stacks, that
+        can be used for flame graphs, to `{prefix}-profile.collapsed`
+        and a summary to `{prefix}-profile.txt`.
+        '''
+        with open(f'{prefix}-profile.collapsed', 'w') as collapsed:
+            for stack, count in stacks.most_common():
+                collapsed.write(
+                    ';'.join(self._describe(code) for code in stack)
+                    + f' {count}\n'
+                )
+
+        # Samples where the function is running (own) and
+        # where it is on the stack (total).
+        own = Counter()
+        total = Counter()
+        focus = Counter()
+        for stack, count in stacks.items():
+            if not stack:
+                continue
+            own[self._describe(stack[-1])] += count
+            for description in set(self._describe(code) for code in stack):
+                total[description] += count
+            for label in self._focus_labels(stack):
+                focus[label] += count
+
+        with open(f'{prefix}-profile.txt', 'w') as summary:
+            summary.write('Sampling profile of the event loop thread.\n')
+            summary.write(f'Duration: {self.duration}s\n')
+            summary.write(f'Interval: {self.interval}s\n')
+            summary.write(f'Samples: {samples}\n\n')
+
+            summary.write('[Focus] % of samples on the stack\n')
+            for label, _, _ in self.focus:
+                summary.write(f'{self._percent(focus[label], samples):>7} {label}\n')
+
+            summary.write('\n[Own] % of samples running the function\n')
+            for description, count in own.most_common(30):
+                summary.write(f'{self._percent(count, samples):>7} {description}\n')
+
+            summary.write('\n[Total] % of samples on the stack\n')
+            for description, count in total.most_common(30):
+                summary.write(f'{self._percent(count, samples):>7} {description}\n')
+
+
+    def write_allocations(self, prefix, before, after):
+        '''
+        Writes the difference of `tracemalloc` snapshot
+        `before` and `after` to `{prefix}-allocations.txt`.
+        '''
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ]
+        before = before.filter_traces(ignore)
+        after = after.filter_traces(ignore)
+
+        with open(f'{prefix}-allocations.txt', 'w') as allocations:
+            allocations.write('Allocations difference of tracemalloc snapshots.\n')
+            allocations.write(f'Duration: {self.duration}s\n\n')
+
+            allocations.write('[Focus] Allocated by or under the files\n')
+            for label, patterns, _ in self.focus:
+                filters = [
+                    tracemalloc.Filter(True, pattern, all_frames=True)
+                    for pattern in patterns
+                ]
+                stats = after.filter_traces(filters).compare_to(
+                    before.filter_traces(filters),
+                    'filename'
+                )
+                size = sum(stat.size_diff for stat in stats)
+                count = sum(stat.count_diff for stat in stats)
+                allocations.write(f'{size:+} B {count:+} blocks {label}\n')
+
+            allocations.write('\n[Top] Allocated by line\n')
+            for stat in after.compare_to(before, 'lineno')[:50]:
+                allocations.write(f'{stat}\n')
+
+
+    def _focus_labels(self, stack):
+        '''
+        Returns the labels of `self.focus` that any code
+        of `stack` belongs to.
+
+        This method should not be use by other API.
+        '''
+        labels = set()
+        for code in stack:
+            for label, patterns, function in self.focus:
+                if function is not None and not code.co_name == function:
+                    continue
+                if any(fnmatch(code.co_filename, pattern) for pattern in patterns):
+                    labels.add(label)
+        return labels
+
+
+    def _describe(self, code):
+        '''
+        Returns the function name and where it is
+        defined from `code`.
+
+        This method should not be use by other API.
+        '''
+        return f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+
+
+    def _percent(self, count, samples):
+        '''
+        Returns `count` as percentage of `samples`.
+
+        This method should not be use by other API.
+        '''
+        return f'{(100 * count / samples) if samples else 0:.1f}%'
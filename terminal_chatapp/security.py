@@ -33,6 +33,20 @@ class Security:
         return encrypted_message
     
 
+    def encrypted_size(self, size):
+        '''
+        Returns the size of a message of `size` bytes after 
+        encrypting it with `self.encrypt()`.
+        '''
+        for _ in range(self.digest_count):
+            # Fernet token is version, timestamp, IV, the 
+            # message padded to 16 bytes blocks, and HMAC, 
+            # encoded as base64.
+            size = 1 + 8 + 16 + (size // 16 + 1) * 16 + 32
+            size = (size + 2) // 3 * 4
+        return size
+    
+
     def decrypt(self, encrypted_message):
         '''
         Decrypts the `encrypted_message` based on `self.digest_count`.
@@ -1,13 +1,22 @@
 import asyncio
+import hmac
 import json
+import signal
+import threading
+from collections import deque
 
 import websockets
 from cryptography.fernet import Fernet
 
+from .connection import Connection
 from .event import (
     create_message_event, 
+    create_missing_event,
+    create_profiling_event,
+    create_statistics_event,
     create_users_event
 )
+from .profiler import Profiler
 from .security import Security
 
 
@@ -20,7 +29,19 @@ class Server:
         self, 
         port, 
         password='top_secret', 
-        cryptography_digest_count=3
+        cryptography_digest_count=3,
+        history_size=100,
+        max_message_size=2 ** 16,
+        max_queue=4,
+        read_limit=2 ** 12,
+        write_limit=2 ** 12,
+        users_event_delay=0.5,
+        profile_dir=None,
+        profile_duration=10.0,
+        admin_password=None,
+        idle_timeout=60.0,
+        reap_interval=5.0,
+        send_timeout=5.0
         ):
 
         self.port = int(port)
@@ -35,9 +56,61 @@ class Server:
             cryptography_digest_count
         )
 
-        # For clients that is connected
-        self.users = set()
-        self.usernames = []
+        # For clients that is connected. Each websocket
+        # is mapped to its `Connection`.
+        self.users = {}
+        self.usernames = set()
+
+        # Chat clients are mostly idle and only send small 
+        # messages, so keep the buffers and queue of each 
+        # connection small. `max_message_size` is for the 
+        # message before it is encrypted, since each digest 
+        # of cryptography makes the message bigger.
+        self.serve_options = {
+            'max_size': self.security.encrypted_size(max_message_size),
+            'max_queue': max_queue,
+            'read_limit': read_limit,
+            'write_limit': write_limit,
+            'compression': None
+        }
+
+        # Registering and unregistering many websockets at 
+        # once only sends one `users` event after 
+        # `users_event_delay` seconds.
+        self.users_event_delay = users_event_delay
+        self._users_event = None
+
+        # For capturing a profile of the server while it is 
+        # running, on SIGUSR1 or `profile` event of admin 
+        # clients. If `profile_dir` is None, it is disabled.
+        self.admin_password = admin_password
+        self.profiler = None
+        if profile_dir is not None:
+            self.profiler = Profiler(profile_dir, profile_duration)
+
+        # Every event sent to all users is stamped with a
+        # monotonically increasing sequence number so that
+        # clients can detect lost or out of order events.
+        # The last `history_size` events are kept for
+        # sending them again to clients that missed them.
+        self.sequence = 0
+        self.history = deque(maxlen=max(int(history_size), 0))
+
+        # Clients send a `heartbeat` event while they are 
+        # connected. Every `reap_interval` seconds, websockets 
+        # that did not send anything for `idle_timeout` seconds, 
+        # like half-open connections, are reaped. If 
+        # `idle_timeout` is None or 0, it is disabled.
+        # `self.reaped` counts the reaped websockets, admin 
+        # clients can get it with the `stats` event.
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self.reaped = 0
+
+        # A websocket that can't receive a message in 
+        # `send_timeout` seconds, like a dead peer with a full 
+        # buffer, does not hold up sending it to the others.
+        self.send_timeout = send_timeout
     
     
     async def server(self, websocket, path):
@@ -67,6 +140,7 @@ class Server:
             )
             return
 
+        connection = self.users[websocket]
         try:
             # When there is a message from
             # any websocket, decrypt the 
@@ -78,6 +152,7 @@ class Server:
             # only a valid websocket can send
             # a right encrypted message.
             async for message in websocket:
+                connection.last_seen = self.loop.time()
                 message = self.security.decrypt(message)
                 if message is None:
                     await websocket.close(
@@ -86,13 +161,36 @@ class Server:
                     )
                     break
                 message = json.loads(message)
-                if message:
+                if message.get('type') == 'heartbeat':
+                    continue
+                elif message.get('type') == 'resend':
+                    await self.resend(
+                        websocket, 
+                        message.get('start'), 
+                        message.get('end')
+                    )
+                elif message.get('type') == 'profile':
+                    await self.admin_profile(
+                        websocket, 
+                        message.get('password')
+                    )
+                elif message.get('type') == 'stats':
+                    await self.admin_stats(
+                        websocket, 
+                        message.get('password')
+                    )
+                elif message:
                     await self.notify_all_user(
-                        create_message_event(
-                            message['from'],
-                            message['message']
-                        )
+                        create_message_event,
+                        _from=message['from'],
+                        message=message['message']
                     )
+        except websockets.ConnectionClosed:
+            # A reaped websocket is already unregistered and 
+            # its connection is aborted on purpose, so it is 
+            # not an error.
+            if websocket in self.users:
+                raise
         finally:
             # Before or after the websocket disconnect to the server
             # unregister them.
@@ -104,10 +202,10 @@ class Server:
         First it checks if the websocket is authorized,
         if not, it returns False. Then it register
         the websocket to the server by adding the 
-        websocket to `self.users` and its username 
-        to `self.usernames`. If the websocket does 
-        not have username, it will only add the 
-        websocket to `self.users`. If the websocket 
+        websocket and its `Connection` to `self.users` 
+        and its username to `self.usernames`. If the 
+        websocket does not have username, it will only 
+        add the websocket to `self.users`. If the websocket 
         username is already registered, this will 
         return False, as we don't want a duplicate 
         username.
@@ -118,6 +216,8 @@ class Server:
 
         # Check if the websocket is authorized, if not
         # return False
+        if self.has_duplicate_headers(websocket):
+            return False
         if not self.is_authorized(websocket):
             return False
 
@@ -129,13 +229,13 @@ class Server:
         if username is not None:
             if username in self.usernames:
                 return False
-            self.usernames.append(username)
-        self.users.add(websocket)
+            self.usernames.add(username)
+        self.users[websocket] = Connection(username, self.loop.time())
         
         
         # Notify the users how many user is connected to the
         # websocket server.
-        await self.notify_all_user(create_users_event(len(self.users)))
+        self.notify_users_count()
         
         # Show to console who connect to the 
         # websocket server.
@@ -158,17 +258,21 @@ class Server:
         its username to `self.usernames`. If
         the websocket does not have username,
         it will only remove the websocket to 
-        `self.users`.
+        `self.users`. If the websocket is already 
+        unregistered, like when it is reaped, it 
+        does nothing.
         '''
 
         # Remove the websocket to `self.users` and websocket
         # username to `self.usernames` if it has.
-        username = self.get_username_header(websocket)
+        connection = self.users.pop(websocket, None)
+        if connection is None:
+            return
+        username = connection.username
         if username is not None:
             self.usernames.remove(username)
-        self.users.remove(websocket)
 
-        await self.notify_all_user(create_users_event(len(self.users)))
+        self.notify_users_count()
         
         # Show to console who disconnect
         # to the websocket server.
@@ -181,22 +285,229 @@ class Server:
         print('[Path]', path)
     
 
-    async def notify_all_user(self, message):
+    async def notify_all_user(self, create_event, **kwargs):
         '''
-        If `self.users` is not empty, encrypt the
-        `message`, decode it as unicode, and send it 
-        to all `self.users`.
+        Creates the message with `create_event` from 
+        `kwargs` and the next sequence number, and keeps 
+        it on `self.history`. Then if `self.users` is not 
+        empty, encrypt the message, decode it as unicode, 
+        and send it to all `self.users` that are not idle 
+        for `self.idle_timeout` seconds, since they are 
+        about to be reaped.
+
+        A websocket that can't receive the message in 
+        `self.send_timeout` seconds does not stop sending 
+        it to the others.
         '''
-        if self.users:
+        self.sequence += 1
+        message = create_event(**kwargs, seq=self.sequence)
+        self.history.append(message)
+
+        users = list(self.users)
+        if self.idle_timeout:
+            deadline = self.loop.time() - self.idle_timeout
+            users = [
+                websocket 
+                for websocket, connection in self.users.items() 
+                if connection.last_seen >= deadline
+            ]
+        if users:
             message = self.security.encrypt(message).decode()
-            await asyncio.wait(
-                [
-                    user.send(message)
-                    for user in self.users
-                ]
+            await asyncio.gather(
+                *[
+                    asyncio.wait_for(user.send(message), self.send_timeout)
+                    for user in users
+                ],
+                return_exceptions=True
             )
     
 
+    async def reap_forever(self):
+        '''
+        Reaps the idle websockets with `self.reap()` 
+        every `self.reap_interval` seconds.
+        '''
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            self.reap()
+
+
+    def reap(self):
+        '''
+        Unregisters the websockets that did not send 
+        any message for `self.idle_timeout` seconds and 
+        aborts their connection, dropping the data that 
+        is still buffered for them. It adds how many 
+        websockets are reaped to `self.reaped`.
+        '''
+        deadline = self.loop.time() - self.idle_timeout
+        idle = [
+            (websocket, connection) 
+            for websocket, connection in self.users.items() 
+            if connection.last_seen < deadline
+        ]
+        for websocket, connection in idle:
+            del self.users[websocket]
+            username = connection.username
+            if username is not None:
+                self.usernames.remove(username)
+
+            # Show to console who is reaped.
+            print('[Reaped]')
+            print('Username:', 'No username' if username is None else username)
+            print(
+                'Address:', 
+                f'{websocket.remote_address[0]}:{websocket.remote_address[1]}'
+            )
+
+            # Closing handshake would wait for a dead peer,
+            # so close the connection right away.
+            websocket.transport.abort()
+            self.reaped += 1
+
+        if idle:
+            print('Reaped Total:', self.reaped)
+            self.notify_users_count()
+
+
+    def notify_users_count(self):
+        '''
+        Schedules a `users` event that notifies the users 
+        how many user is connected to the server after 
+        `self.users_event_delay` seconds. If one is already 
+        scheduled, it does nothing since that event will 
+        have the latest count.
+        '''
+        if self._users_event is None:
+            self._users_event = self.loop.create_task(
+                self._notify_users_count()
+            )
+
+
+    async def _notify_users_count(self):
+        '''
+        Sends the `users` event scheduled by 
+        `self.notify_users_count()`.
+
+        This method should not be use by other API.
+        '''
+        await asyncio.sleep(self.users_event_delay)
+        self._users_event = None
+        await self.notify_all_user(create_users_event, users=len(self.users))
+
+
+    async def resend(self, websocket, start, end):
+        '''
+        Sends again the events from sequence number `start` 
+        to `end` that are still on `self.history` to the 
+        `websocket`. If some of them are no longer on 
+        `self.history`, it sends a `missing` event first 
+        so the websocket can stop waiting for them.
+
+        If `start` or `end` is not an int, the request 
+        is ignored.
+        '''
+        if not isinstance(start, int) or not isinstance(end, int):
+            return
+        start = max(start, 1)
+        end = min(end, self.sequence)
+        if start > end:
+            return
+
+        # `self.history` holds the events with sequence number 
+        # from `oldest` up to `self.sequence`. Take the events 
+        # before sending since other users can add more events 
+        # to `self.history` while sending.
+        oldest = self.sequence - len(self.history) + 1
+        events = []
+        if end >= oldest:
+            events = list(self.history)[max(start - oldest, 0):end - oldest + 1]
+
+        if start < oldest:
+            await websocket.send(
+                self.security.encrypt(
+                    create_missing_event(start, min(end, oldest - 1))
+                ).decode()
+            )
+
+        for event in events:
+            await websocket.send(self.security.encrypt(event).decode())
+
+
+    async def admin_profile(self, websocket, password):
+        '''
+        Captures a profile with `self.profile()` if `password` 
+        is equal to `self.admin_password`, and tells the 
+        `websocket` if capturing is started and if it is 
+        authorized.
+        '''
+        authorized = self.is_admin(password)
+        started = authorized and self.profile()
+        await websocket.send(
+            self.security.encrypt(
+                create_profiling_event(started, authorized)
+            ).decode()
+        )
+
+
+    async def admin_stats(self, websocket, password):
+        '''
+        Sends `self.get_stats()` to the `websocket` if 
+        `password` is equal to `self.admin_password`. If 
+        not, it only tells the `websocket` that it is not 
+        authorized.
+        '''
+        if self.is_admin(password):
+            event = create_statistics_event(True, **self.get_stats())
+        else:
+            event = create_statistics_event(False)
+        await websocket.send(self.security.encrypt(event).decode())
+
+
+    def get_stats(self):
+        '''
+        Returns the statistics of the server as dict. 
+        `users` is how many users are connected, and 
+        `reaped` is how many users are reaped since 
+        the server started.
+        '''
+        return {'users': len(self.users), 'reaped': self.reaped}
+
+
+    def profile(self):
+        '''
+        Starts capturing a profile of the event loop thread 
+        with `self.profiler` without stopping the server. 
+        This must be called from the event loop thread.
+
+        It returns True if capturing is started, otherwise 
+        False if profiling is disabled or a capture is 
+        already running.
+        '''
+        if self.profiler is None:
+            return False
+        started = self.profiler.capture(threading.get_ident())
+        if started:
+            print('[Profile]', f'Capturing for {self.profiler.duration}s.')
+        return started
+
+
+    def is_admin(self, password):
+        '''
+        Validates the `password` from `profile` or `stats` 
+        event if its value is equal to `self.admin_password`.
+
+        It returns False if the server does not have 
+        an admin password.
+        '''
+        if self.admin_password is None or not isinstance(password, str):
+            return False
+        return hmac.compare_digest(
+            password.encode(), 
+            self.admin_password.encode()
+        )
+
+
     def is_authorized(self, websocket):
         '''
         Validates the websocket authorization header 
@@ -208,14 +519,12 @@ class Server:
         decrypted with `self.security`, it will return
         False.
         '''
-        headers = self.get_headers(websocket)
-        if not 'authorization' in headers:
+        authorization = self.get_header(websocket, 'authorization')
+        if authorization is None:
             return False
 
         # Decrypt the websocket authorization header.
-        websocket_password = self.security.decrypt(
-            headers['authorization']
-        )
+        websocket_password = self.security.decrypt(authorization)
 
         # If authorization header can't be decrypted,
         # return False.
@@ -235,14 +544,12 @@ class Server:
         decrypted with `self.security`, it returns 
         None.
         '''
-        headers = self.get_headers(websocket)
-        if not 'username' in headers:
+        username = self.get_header(websocket, 'username')
+        if username is None:
             return None
 
         # Decrypt the websocket username.
-        websocket_username = self.security.decrypt(
-            headers['username']
-        )
+        websocket_username = self.security.decrypt(username)
 
         # If websocket username can't be decrypted
         # return None
@@ -254,11 +561,29 @@ class Server:
         return websocket_username.decode()
 
 
-    def get_headers(self, websocket):
+    def has_duplicate_headers(self, websocket):
+        '''
+        Returns True if the websocket has more than one 
+        authorization or username header, since the server 
+        can't tell which one is right.
+        '''
+        return any(
+            len(websocket.request_headers.get_all(name)) > 1
+            for name in ('authorization', 'username')
+        )
+
+
+    def get_header(self, websocket, name):
         '''
-        Returns the headers as dict from websocket.
+        Returns the value of header `name` from websocket 
+        without copying the headers. Header names are 
+        case-insensitive. If not found or the websocket 
+        has more than one of it, it returns None.
         '''
-        return dict([header for header in websocket.request_headers.raw_items()])
+        values = websocket.request_headers.get_all(name)
+        if not len(values) == 1:
+            return None
+        return values[0]
     
 
     def run(self):
@@ -274,8 +599,21 @@ class Server:
         print('Please copy the following key below, you will need it for connecting to this server:')
         print(f'Key: {self.cryptography_key}')
         
+        # Reap idle websockets if idle timeout is enabled.
+        if self.idle_timeout:
+            self.loop.create_task(self.reap_forever())
+
+        # Capture a profile on SIGUSR1 if profiling is enabled.
+        if self.profiler is not None and hasattr(signal, 'SIGUSR1'):
+            self.loop.add_signal_handler(signal.SIGUSR1, self.profile)
+        
         # Run the server forever.
         self.loop.run_until_complete(
-            websockets.serve(self.server, 'localhost', self.port)
+            websockets.serve(
+                self.server, 
+                'localhost', 
+                self.port,
+                **self.serve_options
+            )
         )
         self.loop.run_forever()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from websockets.datastructures import Headers
+from websockets.exceptions import ConnectionClosedError
+
+
+class FakeTransport:
+    '''
+    Transport of `FakeWebsocket` that records if it is
+    aborted and calls `on_abort`.
+    '''
+
+    def __init__(self, on_abort):
+        self.aborted = False
+        self.on_abort = on_abort
+
+
+    def abort(self):
+        self.aborted = True
+        self.on_abort()
+
+
+class FakeWebsocket:
+    '''
+    Websocket that keeps the messages sent to it instead of
+    sending them. Each send yields to the event loop, like
+    a real websocket, so other tasks can run while sending.
+
+    Iterating it gives the messages put with `self.receive()`
+    until its transport is aborted, then it raises
+    `ConnectionClosedError` like a real websocket.
+    '''
+
+    def __init__(self, security, port=1234, headers=()):
+        self.security = security
+        self.request_headers = Headers(headers)
+        self.remote_address = ('127.0.0.1', port)
+        self.transport = FakeTransport(self._abort)
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+
+    def receive(self, message):
+        self.incoming.put_nowait(message)
+
+
+    def _abort(self):
+        self.incoming.put_nowait(ConnectionClosedError(None, None))
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+    async def send(self, message):
+        await asyncio.sleep(0)
+        self.sent.append(message)
+
+
+    async def close(self, code=1000, reason=''):
+        self._abort()
+
+
+    def events(self):
+        '''
+        Returns the sent messages as decrypted events.
+        '''
+        return [
+            json.loads(self.security.decrypt(message))
+            for message in self.sent
+        ]
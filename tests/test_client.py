@@ -0,0 +1,110 @@
+import asyncio
+import json
+import unittest
+
+from cryptography.fernet import Fernet
+
+from terminal_chatapp.client import Client
+from terminal_chatapp.event import create_message_event
+
+from .fakes import FakeWebsocket
+
+
+def message_event(seq):
+    return json.loads(create_message_event('other', str(seq), seq=seq))
+
+
+class ReceiveInOrderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = Client(
+            Fernet.generate_key().decode(), 
+            username='me', 
+            reorder_window=3, 
+            gap_timeout=60
+        )
+        self.websocket = FakeWebsocket(self.client.security)
+        self.shown = []
+        self.client.show_event = lambda rcv: self.shown.append(rcv['seq'])
+
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+
+    def receive(self, *seqs):
+        async def receive():
+            for seq in seqs:
+                await self.client.receive_in_order(
+                    self.websocket, 
+                    message_event(seq)
+                )
+        self.loop.run_until_complete(receive())
+
+
+    def test_reorders_within_window(self):
+        self.receive(1, 3, 2, 4)
+        self.assertEqual(self.shown, [1, 2, 3, 4])
+        self.assertEqual(self.websocket.sent, [])
+
+
+    def test_ignores_duplicates(self):
+        self.receive(1, 2, 2, 1, 3)
+        self.assertEqual(self.shown, [1, 2, 3])
+
+
+    def test_asks_resend_when_window_is_full(self):
+        self.receive(1, 3, 4, 5, 6)
+        self.assertEqual(
+            self.websocket.events(), 
+            [{'type': 'resend', 'start': 2, 'end': 2}]
+        )
+        self.assertEqual(self.shown, [1])
+
+
+    def test_waits_for_delayed_resend(self):
+        self.receive(1, 3, 4, 5, 6, 7, 8)
+        self.assertEqual(len(self.websocket.sent), 1)
+        self.assertEqual(self.client.next_sequence, 2)
+
+        # The event sent again by the server is slow, not lost.
+        self.receive(2)
+        self.assertEqual(self.shown, [1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(self.client.next_sequence, 9)
+
+
+    def test_skips_gap_after_resend_deadline(self):
+        self.client.gap_timeout = 0
+        self.receive(1, 3, 4, 5, 6, 7)
+        self.assertEqual(len(self.websocket.sent), 1)
+        self.assertEqual(self.shown, [1, 3, 4, 5, 6, 7])
+
+        # Late event is ignored once it is declared lost.
+        self.receive(2)
+        self.assertEqual(self.shown, [1, 3, 4, 5, 6, 7])
+
+
+    def test_skips_gap_on_missing_reply(self):
+        self.receive(1, 3, 4, 5, 6)
+        self.client.skip_missing(2, 2)
+        self.assertEqual(self.shown, [1, 3, 4, 5, 6])
+        self.assertEqual(self.client.next_sequence, 7)
+
+
+    def test_asks_resend_again_for_next_gap(self):
+        self.receive(1, 3, 4, 5, 6, 2)
+        self.receive(8, 9, 10, 11)
+        self.assertEqual(
+            self.websocket.events(), 
+            [
+                {'type': 'resend', 'start': 2, 'end': 2},
+                {'type': 'resend', 'start': 7, 'end': 7}
+            ]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from terminal_chatapp.profiler import Profiler
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+
+    def capture(self, profiler):
+        started = profiler.capture(threading.get_ident())
+        profiler._thread.join()
+        return started
+
+
+    def read(self, suffix):
+        files = [
+            name for name in os.listdir(self.directory.name) 
+            if name.endswith(suffix)
+        ]
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(self.directory.name, files[0])) as result:
+            return result.read()
+
+
+    def test_writes_results(self):
+        profiler = Profiler(self.directory.name, duration=0.05)
+        self.assertTrue(self.capture(profiler))
+
+        profile = self.read('-profile.txt')
+        self.assertIn('[Focus]', profile)
+        for label, _, _ in Profiler.focus:
+            self.assertIn(label, profile)
+        self.assertIn('capture', self.read('-profile.collapsed'))
+
+        allocations = self.read('-allocations.txt')
+        self.assertIn('[Focus]', allocations)
+        self.assertIn('[Top]', allocations)
+
+
+    def test_one_capture_at_a_time(self):
+        profiler = Profiler(self.directory.name, duration=0.2)
+        self.assertTrue(profiler.capture(threading.get_ident()))
+        self.assertFalse(profiler.capture(threading.get_ident()))
+        profiler._thread.join()
+
+        # Capturing again is allowed after the first one ends.
+        self.assertTrue(self.capture(profiler))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from cryptography.fernet import Fernet
+
+from terminal_chatapp.security import Security
+
+
+class SecurityTest(unittest.TestCase):
+
+    def test_encrypted_size(self):
+        key = Fernet.generate_key()
+        for digest_count in range(1, 6):
+            security = Security(key, digest_count)
+            for size in (0, 1, 15, 16, 17, 1000, 2 ** 16):
+                self.assertEqual(
+                    len(security.encrypt(b'x' * size)), 
+                    security.encrypted_size(size)
+                )
+
+
+    def test_decrypt_invalid_message(self):
+        security = Security(Fernet.generate_key(), 3)
+        self.assertIsNone(security.decrypt('not encrypted'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,348 @@
+import asyncio
+import tempfile
+import unittest
+
+from websockets.exceptions import ConnectionClosedError
+
+from terminal_chatapp.connection import Connection
+from terminal_chatapp.event import create_message_event
+from terminal_chatapp.server import Server
+
+from .fakes import FakeWebsocket
+
+
+class ServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+
+    def tearDown(self):
+        # Finish the `users` events that are still scheduled.
+        pending = asyncio.all_tasks(self.loop)
+        if pending:
+            self.loop.run_until_complete(asyncio.gather(*pending))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+    def create_server(self, **kwargs):
+        return Server(1719, **kwargs)
+
+
+    def broadcast(self, server, message):
+        return server.notify_all_user(
+            create_message_event, 
+            _from='other', 
+            message=message
+        )
+
+
+class SequenceTest(ServerTestCase):
+
+    def test_concurrent_broadcasts_are_sequenced(self):
+        server = self.create_server()
+        users = [FakeWebsocket(server.security, port) for port in range(3)]
+        server.users = {
+            user: Connection(None, server.loop.time()) for user in users
+        }
+
+        async def broadcast_all():
+            await asyncio.gather(
+                *[self.broadcast(server, str(index)) for index in range(20)]
+            )
+        self.run_async(broadcast_all())
+
+        for user in users:
+            seqs = [event['seq'] for event in user.events()]
+            self.assertEqual(sorted(seqs), list(range(1, 21)))
+        self.assertEqual(server.sequence, 20)
+
+
+    def test_resend_while_broadcasting(self):
+        server = self.create_server(history_size=3)
+        websocket = FakeWebsocket(server.security)
+
+        async def resend_while_broadcasting():
+            for index in range(5):
+                await self.broadcast(server, str(index))
+            await asyncio.gather(
+                server.resend(websocket, 3, 5),
+                self.broadcast(server, 'during resend')
+            )
+        self.run_async(resend_while_broadcasting())
+
+        self.assertEqual(
+            [event['seq'] for event in websocket.events()], 
+            [3, 4, 5]
+        )
+
+
+    def test_resend_tells_missing_events(self):
+        server = self.create_server(history_size=2)
+        websocket = FakeWebsocket(server.security)
+
+        async def resend():
+            for index in range(5):
+                await self.broadcast(server, str(index))
+            await server.resend(websocket, 2, 5)
+        self.run_async(resend())
+
+        events = websocket.events()
+        self.assertEqual(events[0], {'type': 'missing', 'start': 2, 'end': 3})
+        self.assertEqual([event['seq'] for event in events[1:]], [4, 5])
+
+
+    def test_resend_ignores_invalid_range(self):
+        server = self.create_server()
+        websocket = FakeWebsocket(server.security)
+        self.run_async(self.broadcast(server, 'hello'))
+
+        for start, end in [(None, None), ('1', 1), (1, [2]), (2, 1)]:
+            self.run_async(server.resend(websocket, start, end))
+        self.assertEqual(websocket.sent, [])
+
+
+class RegisterTest(ServerTestCase):
+
+    def register(self, server, headers):
+        websocket = FakeWebsocket(server.security, headers=[
+            (name, server.security.encrypt(value).decode())
+            for name, value in headers
+        ])
+
+        async def register():
+            return await server.register(websocket, '/')
+        return self.run_async(register())
+
+
+    def test_registers_username(self):
+        server = self.create_server(users_event_delay=0)
+        self.assertTrue(self.register(server, [
+            ('authorization', 'top_secret'), 
+            ('username', 'ace')
+        ]))
+        self.assertEqual(server.usernames, {'ace'})
+        self.assertEqual(len(server.users), 1)
+
+
+    def test_rejects_registered_username(self):
+        server = self.create_server(users_event_delay=0)
+        headers = [('authorization', 'top_secret'), ('username', 'ace')]
+        self.assertTrue(self.register(server, headers))
+        self.assertFalse(self.register(server, headers))
+
+
+    def test_rejects_wrong_password(self):
+        server = self.create_server(users_event_delay=0)
+        self.assertFalse(self.register(server, [('authorization', 'guess')]))
+
+
+    def test_rejects_duplicate_headers(self):
+        server = self.create_server(users_event_delay=0)
+        self.assertFalse(self.register(server, [
+            ('authorization', 'top_secret'), 
+            ('authorization', 'top_secret')
+        ]))
+        self.assertFalse(self.register(server, [
+            ('authorization', 'top_secret'), 
+            ('username', 'ace'), 
+            ('Username', 'other')
+        ]))
+        self.assertEqual(server.users, {})
+
+
+class ReapTest(ServerTestCase):
+
+    def create_server(self, **kwargs):
+        server = super().create_server(
+            idle_timeout=30, 
+            users_event_delay=0, 
+            admin_password='admin',
+            **kwargs
+        )
+        now = server.loop.time()
+        self.idle = FakeWebsocket(server.security, 1)
+        self.active = FakeWebsocket(server.security, 2)
+        server.users = {
+            self.idle: Connection('idle', now - 60),
+            self.active: Connection(None, now)
+        }
+        server.usernames = {'idle'}
+        return server
+
+
+    def test_reaps_idle_users(self):
+        server = self.create_server()
+        server.reap()
+
+        self.assertEqual(list(server.users), [self.active])
+        self.assertEqual(server.usernames, set())
+        self.assertTrue(self.idle.transport.aborted)
+        self.assertFalse(self.active.transport.aborted)
+        self.assertEqual(server.get_stats(), {'users': 1, 'reaped': 1})
+
+
+    def test_unregister_after_reap(self):
+        server = self.create_server()
+        server.reap()
+        self.run_async(server.unregister(self.idle, '/'))
+        self.assertEqual(list(server.users), [self.active])
+
+
+    def test_admin_stats(self):
+        server = self.create_server()
+        server.reap()
+        self.run_async(server.admin_stats(self.active, 'guess'))
+        self.run_async(server.admin_stats(self.active, 'admin'))
+        self.assertEqual(
+            [
+                event for event in self.active.events() 
+                if event['type'] == 'statistics'
+            ], 
+            [
+                {'type': 'statistics', 'authorized': False},
+                {'type': 'statistics', 'authorized': True, 'users': 1, 'reaped': 1}
+            ]
+        )
+
+
+    def test_handler_exits_quietly_when_reaped(self):
+        server = self.create_server()
+        websocket = FakeWebsocket(server.security, 3, headers=[
+            ('authorization', server.security.encrypt('top_secret').decode())
+        ])
+
+        async def reap_while_handling():
+            handler = asyncio.ensure_future(server.server(websocket, '/'))
+            while websocket not in server.users:
+                await asyncio.sleep(0)
+            server.users[websocket].last_seen -= 60
+            server.reap()
+            await handler
+        self.run_async(reap_while_handling())
+
+        self.assertNotIn(websocket, server.users)
+        self.assertEqual(server.reaped, 2)
+
+
+    def test_handler_raises_when_not_reaped(self):
+        server = self.create_server()
+        websocket = FakeWebsocket(server.security, 3, headers=[
+            ('authorization', server.security.encrypt('top_secret').decode())
+        ])
+
+        async def abort_while_handling():
+            handler = asyncio.ensure_future(server.server(websocket, '/'))
+            while websocket not in server.users:
+                await asyncio.sleep(0)
+            websocket.transport.abort()
+            await handler
+        with self.assertRaises(ConnectionClosedError):
+            self.run_async(abort_while_handling())
+        self.assertNotIn(websocket, server.users)
+
+
+class StuckWebsocket(FakeWebsocket):
+    '''
+    Websocket of a dead peer, sending to it never finishes.
+    '''
+
+    async def send(self, message):
+        await asyncio.Future()
+
+
+class BroadcastTest(ServerTestCase):
+
+    def test_stuck_user_does_not_hold_up_broadcast(self):
+        server = self.create_server(send_timeout=0.05)
+        stuck = StuckWebsocket(server.security, 1)
+        active = FakeWebsocket(server.security, 2)
+        now = server.loop.time()
+        server.users = {
+            stuck: Connection(None, now), 
+            active: Connection(None, now)
+        }
+
+        self.run_async(
+            asyncio.wait_for(self.broadcast(server, 'hello'), 1)
+        )
+        self.assertEqual([event['seq'] for event in active.events()], [1])
+
+
+    def test_skips_idle_users(self):
+        server = self.create_server(idle_timeout=30)
+        idle = FakeWebsocket(server.security, 1)
+        active = FakeWebsocket(server.security, 2)
+        now = server.loop.time()
+        server.users = {
+            idle: Connection(None, now - 60), 
+            active: Connection(None, now)
+        }
+
+        self.run_async(self.broadcast(server, 'hello'))
+        self.assertEqual(idle.sent, [])
+        self.assertEqual(len(active.sent), 1)
+
+
+class AdminTest(ServerTestCase):
+
+    def create_server(self, **kwargs):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return super().create_server(
+            profile_dir=self.directory.name, 
+            profile_duration=0.05, 
+            **kwargs
+        )
+
+
+    def test_is_admin(self):
+        server = self.create_server(admin_password='admin')
+        self.assertTrue(server.is_admin('admin'))
+        self.assertFalse(server.is_admin('guess'))
+        self.assertFalse(server.is_admin(None))
+        self.assertFalse(self.create_server().is_admin('admin'))
+
+
+    def test_profile_not_authorized(self):
+        server = self.create_server(admin_password='admin')
+        websocket = FakeWebsocket(server.security)
+        self.run_async(server.admin_profile(websocket, 'guess'))
+        self.run_async(server.admin_profile(websocket, None))
+
+        self.assertEqual(
+            websocket.events(), 
+            [{'type': 'profiling', 'started': False, 'authorized': False}] * 2
+        )
+        self.assertIsNone(server.profiler._thread)
+
+
+    def test_profile_authorized(self):
+        server = self.create_server(admin_password='admin')
+        websocket = FakeWebsocket(server.security)
+        self.run_async(server.admin_profile(websocket, 'admin'))
+        self.run_async(server.admin_profile(websocket, 'admin'))
+        server.profiler._thread.join()
+
+        self.assertEqual(
+            websocket.events(), 
+            [
+                {'type': 'profiling', 'started': True, 'authorized': True},
+                {'type': 'profiling', 'started': False, 'authorized': True}
+            ]
+        )
+
+
+    def test_profile_disabled(self):
+        server = Server(1719, admin_password='admin')
+        self.assertFalse(server.profile())
+
+
+if __name__ == '__main__':
+    unittest.main()